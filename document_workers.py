@@ -0,0 +1,113 @@
+"""CPU-bound document work run in PaperSynth's worker process pool.
+
+Kept apart from main.py so pool workers only import PyMuPDF and python-pptx,
+not the FastAPI app, torch or diffusers.
+"""
+import io
+import html
+import os
+import uuid
+from datetime import datetime
+
+import fitz  # PyMuPDF
+from pptx import Presentation
+
+PDF_TEXT_FLAGS = fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP
+
+# Summary PDF layout (A4, points)
+SUMMARY_PAGE_RECT = fitz.paper_rect("a4")
+SUMMARY_CONTENT_RECT = fitz.Rect(36, 72, SUMMARY_PAGE_RECT.width - 36, SUMMARY_PAGE_RECT.height - 54)
+SUMMARY_PDF_CSS = """
+* { font-family: sans-serif; }
+h2 { font-size: 14pt; font-weight: bold; margin-top: 10pt; margin-bottom: 5pt; }
+p { font-size: 12pt; line-height: 1.4; margin: 0 0 4pt 0; }
+"""
+
+def write_replacing(path: str, write):
+    """Call write(tmp_path) and rename over path, so a hard-linked (cached) inode is never rewritten"""
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def count_pages(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+def extract_shard(pdf_path, shard, num_shards, max_pages, max_chars):
+    """Extract UTF-8 text for every num_shards-th page from shard.
+
+    Returns (buffer, page_ends); page_ends[j] is the end offset of the shard's j-th page.
+    """
+    with fitz.open(pdf_path) as doc:
+        # Accumulate UTF-8 bytes in one growable buffer instead of a list of str
+        buf = bytearray()
+        page_ends = []
+        running = 0
+        for i in range(shard, min(len(doc), max_pages), num_shards):
+            # Plain text only: skip ligature preservation and image handling
+            t = doc[i].get_text("text", flags=PDF_TEXT_FLAGS)
+            buf.extend(t.encode("utf-8"))
+            page_ends.append(len(buf))
+            running += len(t)
+            # No single shard ever needs more than the overall cap
+            if running >= max_chars:
+                break
+        return bytes(buf), page_ends
+
+def _draw_centered(page, y, text, fontname, fontsize):
+    width = fitz.get_text_length(text, fontname=fontname, fontsize=fontsize)
+    page.insert_text(((page.rect.width - width) / 2, y), text, fontname=fontname, fontsize=fontsize)
+
+def render_summary_pdf(sections, output_path):
+    """Lay out and write the summary PDF"""
+    # Build the body as HTML so MuPDF does layout and pagination in C (Unicode-capable fonts)
+    body = []
+    for section, points in sections.items():
+        body.append(f"<h2>{html.escape(section)}</h2>")
+        # Add content with dash instead of bullet
+        body.extend(f"<p>- {html.escape(point)}</p>" for point in points)
+    story = fitz.Story(html="".join(body), user_css=SUMMARY_PDF_CSS)
+
+    buf = io.BytesIO()
+    writer = fitz.DocumentWriter(buf)
+    more = True
+    while more:
+        device = writer.begin_page(SUMMARY_PAGE_RECT)
+        more, _filled = story.place(SUMMARY_CONTENT_RECT)
+        story.draw(device)
+        writer.end_page()
+    writer.close()
+
+    # Header and footer on every page
+    generated = datetime.now().strftime("%Y-%m-%d %H:%M")
+    with fitz.open("pdf", buf.getvalue()) as doc:
+        for page in doc:
+            _draw_centered(page, 40, "PaperSynth - Research Summary", "hebo", 15)
+            _draw_centered(page, page.rect.height - 24, f"Generated on {generated} - Page {page.number + 1}", "heit", 8)
+        write_replacing(output_path, lambda tmp: doc.save(tmp, deflate=True, garbage=3))
+
+def render_presentation(sections, presentation_path):
+    """Build and save the slide deck"""
+    prs = Presentation()
+
+    # Title slide
+    title_slide = prs.slides.add_slide(prs.slide_layouts[0])
+    title_slide.shapes.title.text = "PaperSynth - Research Summary"
+    title_slide.placeholders[1].text = "Generated Summary Presentation"
+
+    # Summary sections
+    for section, points in sections.items():
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = section
+        text_frame = slide.placeholders[1].text_frame
+
+        for point in points:
+            p = text_frame.add_paragraph()
+            p.text = f"• {point}"
+            p.level = 0
+
+    write_replacing(presentation_path, prs.save)
@@ -1,5 +1,6 @@
 import os
 import json
+import re
 import fitz  # PyMuPDF for PDF processing
 from fastapi import FastAPI, UploadFile, HTTPException
 from fastapi import Request
@@ -11,27 +12,33 @@ from dotenv import load_dotenv
 # Conditional imports will be done later when needed
 StableDiffusionXLPipeline = None
 try:
-    from elevenlabs import ElevenLabs
+    from elevenlabs import ElevenLabs, AsyncElevenLabs
 except ImportError:
     ElevenLabs = None
-import requests
-from pptx import Presentation
+    AsyncElevenLabs = None
+import httpx
 import uvicorn
 from huggingface_hub import login
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 import logging 
-from fpdf import FPDF
 import torch
-from datetime import datetime
 from typing import Optional, Union
 import uuid
 import time
+import random
 import shutil
+import threading
+from collections import OrderedDict
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 from fastapi.responses import FileResponse
 import hmac
 import hashlib
+import document_workers
 from urllib.parse import urlencode
 
 # Configure logging
@@ -48,6 +55,15 @@ load_dotenv('backend.env')
 TEMP_DIR = "temp_files"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Content-addressed cache for model outputs (summaries, voiceovers); kept outside TEMP_DIR so
+# request cleanup and /static never see it. Same filesystem as TEMP_DIR lets cache hits hard-link
+CACHE_DIR = os.getenv("CACHE_DIR", "cache_files")
+os.makedirs(CACHE_DIR, exist_ok=True)
+ARTIFACT_CACHE_DIR = os.path.join(CACHE_DIR, "artifacts")
+ARTIFACT_CACHE_MAX_ENTRIES = int(os.getenv("ARTIFACT_CACHE_MAX_ENTRIES", "64"))
+CACHE_SIZE_CAP_BYTES = max(0.1, float(os.getenv("CACHE_SIZE_CAP_GB", "2"))) * (1024 ** 3)
+ARTIFACT_FILES = ("summary.pdf", "graphical_abstract.png", "voiceover.mp3", "presentation.pptx")
+
 # Cleanup policy (configurable)
 TEMP_TTL_HOURS = int(os.getenv("TEMP_TTL_HOURS", "24"))
 TEMP_SIZE_CAP_GB = float(os.getenv("TEMP_SIZE_CAP_GB", "1"))
@@ -57,6 +73,7 @@ MAX_UPLOAD_BYTES = 10 * 1024 * 1024  # 10 MB
 ALLOWED_SUMMARY_LENGTHS = {"short", "medium", "long"}
 MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "100"))
 MAX_TEXT_CHARS = int(os.getenv("MAX_TEXT_CHARS", "800000"))
+PDF_EXTRACT_WORKERS = max(1, int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1))))
 
 # Get API keys securely
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
@@ -65,11 +82,21 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 API_AUTH_TOKEN = os.getenv("API_AUTH_TOKEN")
 RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "10"))
 CONCURRENCY_LIMIT = int(os.getenv("CONCURRENCY_LIMIT", "2"))
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "4"))
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "4000000"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_INPUT_TOKEN_BUDGET = max(1000, int(os.getenv("GEMINI_INPUT_TOKEN_BUDGET", "30000")))
 ALLOWED_CORS_ORIGINS = os.getenv("ALLOWED_CORS_ORIGINS", "http://localhost:3000").split(",")
 ENABLE_SDXL = os.getenv("ENABLE_SDXL", "true").lower() == "true"
 ENABLE_TTS = os.getenv("ENABLE_TTS", "true").lower() == "true"
+SDXL_TORCH_COMPILE = os.getenv("SDXL_TORCH_COMPILE", "true").lower() == "true"
+SDXL_MAX_BATCH = max(1, int(os.getenv("SDXL_MAX_BATCH", "4")))
+# Batch sizes a compiled pipeline is warmed for (powers of two, capped at SDXL_MAX_BATCH)
+SDXL_BATCH_BUCKETS = tuple(sorted({min(2 ** i, SDXL_MAX_BATCH) for i in range(SDXL_MAX_BATCH.bit_length() + 1)}))
+SDXL_BATCH_WINDOW_MS = int(os.getenv("SDXL_BATCH_WINDOW_MS", "100"))
 SIGNED_DOWNLOADS = os.getenv("SIGNED_DOWNLOADS", "false").lower() == "true"
 DOWNLOAD_SIGNING_KEY = os.getenv("DOWNLOAD_SIGNING_KEY", "")
+_SIGN_KEY = DOWNLOAD_SIGNING_KEY.encode() if DOWNLOAD_SIGNING_KEY else b""
 
 # Initialize Gemini client
 if GEMINI_API_KEY:
@@ -127,7 +154,7 @@ def validate_environment():
         if not ElevenLabs:
             validation_results["elevenlabs"] = {"status": "error", "details": "ElevenLabs package not available. Install with: pip install elevenlabs"}
         elif ELEVENLABS_API_KEY and ELEVENLABS_API_KEY != "your-elevenlabs-api-key-here":
-            client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
+            client = _get_elevenlabs_sync_client()
             # Try a minimal API call to validate key
             voices = client.voices.get_all()
             validation_results["elevenlabs"] = {"status": "ok", "details": f"ElevenLabs API key valid, {len(voices.voices)} voices available"}
@@ -260,8 +287,13 @@ app.add_middleware(
 
 # Singleton cache for Stable Diffusion pipeline with lazy loading
 _SDXL_PIPE = None
-_SDXL_LOADING = False
+# Precomputed (negative_prompt_embeds, negative_pooled_prompt_embeds) for the constant negative prompt
+_SDXL_NEG_EMBEDS = None
+# True once the compiled UNet/VAE passed warm-up; batches are then padded to SDXL_BATCH_BUCKETS
+_SDXL_COMPILED = False
 _SDXL_LOAD_LOCK = asyncio.Lock()
+_SDXL_READY = asyncio.Event()
+_SDXL_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sdxl-loader")
 
 # Memory management utilities
 def get_memory_usage():
@@ -289,23 +321,23 @@ def cleanup_gpu_memory():
 
 async def lazy_load_stable_diffusion():
     """Lazy load Stable Diffusion with proper async handling"""
-    global _SDXL_PIPE, _SDXL_LOADING
+    global _SDXL_PIPE
     
     if _SDXL_PIPE is not None:
         return _SDXL_PIPE
+
+    if _SDXL_LOAD_LOCK.locked():
+        # Another request is loading; wake exactly when it finishes
+        await _SDXL_READY.wait()
+        if _SDXL_PIPE is not None:
+            return _SDXL_PIPE
     
     async with _SDXL_LOAD_LOCK:
         # Double-check pattern
         if _SDXL_PIPE is not None:
             return _SDXL_PIPE
-            
-        if _SDXL_LOADING:
-            # Wait for another thread to finish loading
-            while _SDXL_LOADING:
-                await asyncio.sleep(0.1)
-            return _SDXL_PIPE
         
-        _SDXL_LOADING = True
+        _SDXL_READY.clear()
         try:
             logging.info("Starting lazy load of Stable Diffusion XL...")
             memory_before = get_memory_usage()
@@ -314,9 +346,9 @@ async def lazy_load_stable_diffusion():
             def _load_sdxl():
                 return initialize_stable_diffusion()
             
-            # Use thread pool for CPU-intensive loading
-            loop = asyncio.get_event_loop()
-            _SDXL_PIPE = await loop.run_in_executor(None, _load_sdxl)
+            # Use the dedicated SDXL thread so loading never starves the default executor
+            loop = asyncio.get_running_loop()
+            _SDXL_PIPE = await loop.run_in_executor(_SDXL_EXECUTOR, _load_sdxl)
             
             memory_after = get_memory_usage()
             logging.info(f"SDXL loaded successfully. Memory usage: {memory_before['rss_mb']}MB -> {memory_after['rss_mb']}MB")
@@ -326,83 +358,198 @@ async def lazy_load_stable_diffusion():
             logging.error(f"Failed to lazy load SDXL: {e}")
             raise
         finally:
-            _SDXL_LOADING = False
+            _SDXL_READY.set()
 
 # Global concurrency semaphore
 _CONC_SEM = asyncio.Semaphore(CONCURRENCY_LIMIT)
 
-# In-memory rate limit buckets
-_RATE_BUCKETS = {}
+# Shared HTTP connection pool (keep-alive + HTTP/2) for outbound API calls
+_HTTP = httpx.AsyncClient(
+    http2=True,
+    timeout=httpx.Timeout(60.0, connect=10.0),
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+)
 
-def _get_dir_size_bytes(path: str) -> int:
-    total = 0
-    for root, _dirs, files in os.walk(path):
-        for name in files:
-            fp = os.path.join(root, name)
+# ElevenLabs clients, built once and reused (the async one rides the shared pool above)
+_TTS_CLIENT = None
+_ELEVENLABS_SYNC_CLIENT = None
+
+def _get_tts_client():
+    global _TTS_CLIENT
+    if _TTS_CLIENT is None:
+        _TTS_CLIENT = AsyncElevenLabs(api_key=ELEVENLABS_API_KEY, httpx_client=_HTTP)
+    return _TTS_CLIENT
+
+def _get_elevenlabs_sync_client():
+    global _ELEVENLABS_SYNC_CLIENT
+    if _ELEVENLABS_SYNC_CLIENT is None:
+        _ELEVENLABS_SYNC_CLIENT = ElevenLabs(api_key=ELEVENLABS_API_KEY)
+    return _ELEVENLABS_SYNC_CLIENT
+
+# In-flight /process-paper work keyed by upload hash + options, for request coalescing
+_INFLIGHT = {}
+
+# Process pool for CPU-bound document work: MuPDF text extraction and PDF/PPTX rendering
+# (keeps the event loop and GIL free). forkserver, not fork: this process already runs threads and
+# holds CUDA state; workers only import document_workers (PyMuPDF, python-pptx)
+_PDF_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+_PDF_MP_CONTEXT.set_forkserver_preload(["document_workers"])
+
+def _new_pdf_pool():
+    return ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS, mp_context=_PDF_MP_CONTEXT)
+
+_PDF_POOL = _new_pdf_pool()
+_PDF_POOL_LOCK = threading.Lock()
+
+def _replace_broken_pdf_pool(broken):
+    """Swap in a fresh worker pool after a worker died (e.g. MuPDF crashed on a hostile PDF)"""
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        # Concurrent requests may all see the same broken pool; only the first one replaces it
+        if _PDF_POOL is broken:
+            logging.error("Document worker pool broke; starting a new one")
+            _PDF_POOL = _new_pdf_pool()
+    broken.shutdown(wait=False, cancel_futures=True)
+
+async def _run_in_pdf_pool(func, *args):
+    pool = _PDF_POOL
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        _replace_broken_pdf_pool(pool)
+        raise
+
+# In-memory rate limit buckets (LRU-bounded)
+_RATE_BUCKETS = OrderedDict()
+_RATE_BUCKETS_LOCK = threading.Lock()
+MAX_RATE_BUCKETS = int(os.getenv("MAX_RATE_BUCKETS", "100000"))
+
+# Incrementally maintained TEMP_DIR accounting: {"bytes": total, "entries": {dir_path: (mtime, size)}}
+_DIR_STATE = {"bytes": 0, "entries": {}}
+_DIR_STATE_LOCK = threading.Lock()
+
+def _iter_file_sizes(path: str, seen=None):
+    with os.scandir(path) as it:
+        for entry in it:
             try:
-                total += os.path.getsize(fp)
+                if entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    # Hard links (artifact cache) share blocks; count each inode once
+                    if seen is not None and st.st_nlink > 1:
+                        if (st.st_dev, st.st_ino) in seen:
+                            continue
+                        seen.add((st.st_dev, st.st_ino))
+                    yield st.st_size
+                elif entry.is_dir(follow_symlinks=False):
+                    yield from _iter_file_sizes(entry.path, seen)
             except OSError:
                 pass
-    return total
 
-def _cleanup_temp_dir():
+def _get_dir_size_bytes(path: str, seen=None) -> int:
     try:
-        # Collect subdirectories with their modified times and sizes
-        subdirs = []
-        now = time.time()
-        total_size = 0
-        for name in os.listdir(TEMP_DIR):
-            full = os.path.join(TEMP_DIR, name)
-            if os.path.isdir(full):
+        return sum(_iter_file_sizes(path, seen))
+    except OSError:
+        return 0
+
+def _track_dir(path: str):
+    # Register a new request directory so it is subject to TTL even if nothing is written
+    with _DIR_STATE_LOCK:
+        _DIR_STATE["entries"].setdefault(path, (time.time(), 0))
+
+def _record_artifact(path: str):
+    """Account a freshly written file against its parent directory"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    parent = os.path.dirname(path)
+    with _DIR_STATE_LOCK:
+        _mtime, dir_size = _DIR_STATE["entries"].get(parent, (0, 0))
+        _DIR_STATE["entries"][parent] = (time.time(), dir_size + size)
+        _DIR_STATE["bytes"] += size
+
+def _release_artifact(path: str):
+    """Drop a file's charge from its request directory; used once its blocks belong to the cache budget"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    parent = os.path.dirname(path)
+    with _DIR_STATE_LOCK:
+        entry = _DIR_STATE["entries"].get(parent)
+        if entry:
+            released = min(size, entry[1])
+            _DIR_STATE["entries"][parent] = (entry[0], entry[1] - released)
+            _DIR_STATE["bytes"] = max(0, _DIR_STATE["bytes"] - released)
+
+def _remove_request_dir(path: str):
+    shutil.rmtree(path, ignore_errors=True)
+    with _DIR_STATE_LOCK:
+        entry = _DIR_STATE["entries"].pop(path, None)
+        if entry:
+            _DIR_STATE["bytes"] = max(0, _DIR_STATE["bytes"] - entry[1])
+
+def _bootstrap_dir_state():
+    # One scandir pass at startup; afterwards the state is updated as artifacts are written
+    entries = {}
+    total = 0
+    seen = set()
+    now = time.time()
+    try:
+        with os.scandir(TEMP_DIR) as it:
+            for entry in it:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
                 try:
-                    mtime = os.path.getmtime(full)
+                    mtime = entry.stat(follow_symlinks=False).st_mtime
                 except OSError:
                     mtime = now
-                size = _get_dir_size_bytes(full)
-                total_size += size
-                subdirs.append({"path": full, "mtime": mtime, "size": size})
-        
+                size = _get_dir_size_bytes(entry.path, seen)
+                entries[entry.path] = (mtime, size)
+                total += size
+    except OSError as e:
+        logging.warning(f"Could not scan {TEMP_DIR}: {e}")
+    with _DIR_STATE_LOCK:
+        _DIR_STATE["entries"] = entries
+        _DIR_STATE["bytes"] = total
+
+def _cleanup_temp_dir():
+    try:
+        now = time.time()
+        with _DIR_STATE_LOCK:
+            # oldest first
+            snapshot = sorted(_DIR_STATE["entries"].items(), key=lambda e: e[1][0])
+
         # TTL deletion
-        for entry in subdirs:
-            if now - entry["mtime"] > TTL_SECONDS:
+        kept = []
+        for path, (mtime, size) in snapshot:
+            if now - mtime > TTL_SECONDS:
                 try:
-                    shutil.rmtree(entry["path"], ignore_errors=True)
+                    _remove_request_dir(path)
                 except Exception:
                     pass
-
-        # Recompute after TTL deletion
-        total_size = 0
-        kept = []
-        for name in os.listdir(TEMP_DIR):
-            full = os.path.join(TEMP_DIR, name)
-            if os.path.isdir(full):
-                size = _get_dir_size_bytes(full)
-                total_size += size
-                try:
-                    mtime = os.path.getmtime(full)
-                except OSError:
-                    mtime = now
-                kept.append({"path": full, "mtime": mtime, "size": size})
+            else:
+                kept.append(path)
 
         # Size cap deletion: delete oldest until under cap
-        if total_size > SIZE_CAP_BYTES:
-            kept.sort(key=lambda e: e["mtime"])  # oldest first
-            for entry in kept:
-                if total_size <= SIZE_CAP_BYTES:
-                    break
-                try:
-                    shutil.rmtree(entry["path"], ignore_errors=True)
-                    total_size -= entry["size"]
-                except Exception:
-                    pass
+        for path in kept:
+            if _DIR_STATE["bytes"] <= SIZE_CAP_BYTES:
+                break
+            try:
+                _remove_request_dir(path)
+            except Exception:
+                pass
     except Exception as e:
         logging.warning(f"Cleanup task error: {e}")
 
 def _start_cleanup_background_task():
-    import threading
+    _bootstrap_dir_state()
     def _runner():
         while True:
             _cleanup_temp_dir()
+            _evict_cache()
             time.sleep(60 * 60)  # hourly
     t = threading.Thread(target=_runner, daemon=True)
     t.start()
@@ -419,6 +566,12 @@ def _on_startup():
     
     _start_cleanup_background_task()
 
+@app.on_event("shutdown")
+async def _on_shutdown():
+    _PDF_POOL.shutdown(wait=False, cancel_futures=True)
+    _SDXL_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    await _HTTP.aclose()
+
 class RequestIdLoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request, call_next):
         rid = uuid.uuid4().hex
@@ -437,10 +590,86 @@ class RequestIdLoggingMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(RequestIdLoggingMiddleware)
 
+def _sdxl_batch_bucket(n):
+    """Padded batch size for n prompts; compiled graphs only exist for the warmed bucket sizes"""
+    if not _SDXL_COMPILED:
+        return n
+    return next(b for b in SDXL_BATCH_BUCKETS if b >= n)
+
+def _warmup_sdxl(pipe):
+    """Compile and record CUDA Graphs for every (preset size, batch bucket) at load time, not mid-request"""
+    sizes = sorted({params["size"] for params in SDXL_PRESETS.values()})
+    # Each shape is its own compiled graph; keep dynamo from falling back to eager past its default limit
+    torch._dynamo.config.cache_size_limit = max(
+        torch._dynamo.config.cache_size_limit, 2 * len(sizes) * len(SDXL_BATCH_BUCKETS)
+    )
+    t0 = time.perf_counter()
+    for size in sizes:
+        for batch in SDXL_BATCH_BUCKETS:
+            try:
+                with torch.inference_mode():
+                    pipe(prompt=["warmup"] * batch, num_inference_steps=2, height=size, width=size)
+            except torch.cuda.OutOfMemoryError:
+                # Requests at this shape take the OOM fallback anyway
+                torch.cuda.empty_cache()
+                logging.warning(f"SDXL warmup skipped size={size} batch={batch}: out of memory")
+    logging.info(f"SDXL warmup of {len(sizes) * len(SDXL_BATCH_BUCKETS)} shapes completed in {(time.perf_counter()-t0):.1f}s")
+
+def _cache_negative_prompt_embeds(pipe):
+    """Encode the constant negative prompt once so requests skip both CLIP passes for it"""
+    global _SDXL_NEG_EMBEDS
+    try:
+        with torch.inference_mode():
+            embeds, _neg, pooled, _neg_pooled = pipe.encode_prompt(
+                prompt=SDXL_NEGATIVE_PROMPT,
+                device=pipe._execution_device,
+                num_images_per_prompt=1,
+                do_classifier_free_guidance=False,
+            )
+        _SDXL_NEG_EMBEDS = (embeds, pooled)
+    except Exception as e:
+        logging.warning(f"Could not precompute negative prompt embeddings: {e}")
+        _SDXL_NEG_EMBEDS = None
+
+def _enable_fast_attention(pipe):
+    """Use xformers or PyTorch SDPA attention kernels; returns False if neither could be set"""
+    try:
+        import xformers  # noqa: F401
+        pipe.enable_xformers_memory_efficient_attention()
+        logging.info("SDXL attention: xformers memory-efficient kernels")
+        return True
+    except Exception:
+        pass
+    try:
+        # PyTorch SDPA dispatches to Flash/memory-efficient kernels
+        from diffusers.models.attention_processor import AttnProcessor2_0
+        pipe.unet.set_attn_processor(AttnProcessor2_0())
+        logging.info("SDXL attention: PyTorch SDPA")
+        return True
+    except Exception as e:
+        logging.warning(f"Could not enable SDPA attention: {e}")
+        return False
+
+def _load_sdxl_unet_8bit(dtype):
+    """Load the SDXL UNet with bitsandbytes int8 weights, or None if unsupported"""
+    try:
+        from diffusers import BitsAndBytesConfig, UNet2DConditionModel
+        return UNet2DConditionModel.from_pretrained(
+            "stabilityai/stable-diffusion-xl-base-1.0",
+            subfolder="unet",
+            torch_dtype=dtype,
+            use_safetensors=True,
+            variant="fp16",
+            quantization_config=BitsAndBytesConfig(load_in_8bit=True),
+        )
+    except Exception as e:
+        logging.warning(f"8-bit UNet unavailable, falling back to CPU offload: {e}")
+        return None
+
 def initialize_stable_diffusion():
     """Initialize Stable Diffusion with optimal settings"""
     try:
-        global _SDXL_PIPE, StableDiffusionXLPipeline
+        global _SDXL_PIPE, _SDXL_COMPILED, StableDiffusionXLPipeline
         if _SDXL_PIPE is not None:
             return _SDXL_PIPE
 
@@ -455,24 +684,57 @@ def initialize_stable_diffusion():
                 )
 
         if torch.cuda.is_available():
-            # GPU path with memory-efficient settings
+            # Allow TF32 for any remaining float32 matmuls
+            torch.set_float32_matmul_precision("high")
+            # GPU path with memory-efficient settings; bf16 on Ampere+ avoids fp16 NaN issues
+            major, _minor = torch.cuda.get_device_capability(0)
+            dtype = torch.bfloat16 if major >= 8 else torch.float16
+            total_vram = torch.cuda.get_device_properties(0).total_memory
+            # 6-8GB cards: 8-bit UNet fits fully on GPU, avoiding per-step CPU offload
+            unet_8bit = None
+            if 6 * (1024 ** 3) <= total_vram < 8 * (1024 ** 3):
+                unet_8bit = _load_sdxl_unet_8bit(dtype)
+            extra = {"unet": unet_8bit} if unet_8bit is not None else {}
             pipe = StableDiffusionXLPipeline.from_pretrained(
                 "stabilityai/stable-diffusion-xl-base-1.0",
-                torch_dtype=torch.float16,
+                torch_dtype=dtype,
                 use_safetensors=True,
-                variant="fp16"
+                variant="fp16",
+                **extra
             )
             pipe = pipe.to("cuda")
-
-            if torch.cuda.get_device_properties(0).total_memory >= 8 * (1024 ** 3):  # 8GB or more
-                try:
-                    pipe.enable_xformers_memory_efficient_attention()
-                except Exception as e:
-                    logging.warning(f"Could not enable xformers: {e}")
+            # Decode batched latents one image at a time so the VAE is not the OOM bottleneck
+            pipe.enable_vae_slicing()
+            # Memory-efficient attention on every GPU path; slicing is only a fallback since it
+            # would replace the fused kernels with a slower chunked processor
+            fast_attention = _enable_fast_attention(pipe)
+
+            if unet_8bit is not None:
+                logging.info("SDXL UNet loaded in 8-bit; running fully on GPU without CPU offload")
+                pipe.enable_vae_tiling()
+            elif total_vram >= 8 * (1024 ** 3):  # 8GB or more
+                if not fast_attention:
                     pipe.enable_attention_slicing()
+                if SDXL_TORCH_COMPILE and hasattr(torch, "compile"):
+                    eager_unet, eager_decode = pipe.unet, pipe.vae.decode
+                    try:
+                        # reduce-overhead captures the UNet step into CUDA Graphs per input shape
+                        pipe.unet = torch.compile(pipe.unet, mode="reduce-overhead", fullgraph=False)
+                        # Fuse the VAE decode too; it runs once per image at full resolution
+                        pipe.vae.decode = torch.compile(pipe.vae.decode, mode="reduce-overhead", fullgraph=False)
+                        _warmup_sdxl(pipe)
+                        _SDXL_COMPILED = True
+                    except Exception as e:
+                        # Compilation is lazy, so failures surface in the warm-up; fall back to eager
+                        # modules rather than keep wrappers that would fail every request the same way
+                        pipe.unet, pipe.vae.decode = eager_unet, eager_decode
+                        logging.warning(f"Could not torch.compile SDXL UNet, using eager mode: {e}")
             else:
-                pipe.enable_attention_slicing()
+                if not fast_attention:
+                    pipe.enable_attention_slicing()
+                pipe.enable_vae_tiling()
                 pipe.enable_sequential_cpu_offload()
+            _cache_negative_prompt_embeds(pipe)
             _SDXL_PIPE = pipe
             return _SDXL_PIPE
         else:
@@ -493,6 +755,7 @@ def initialize_stable_diffusion():
             )
             pipe = pipe.to("cpu")
             pipe.enable_attention_slicing()
+            _cache_negative_prompt_embeds(pipe)
             _SDXL_PIPE = pipe
             return _SDXL_PIPE
     except Exception as e:
@@ -540,29 +803,34 @@ def health():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
 
+def _sign_download(rid: str, name: str, expires: int) -> str:
+    # One-shot C HMAC with the key encoded once at import time
+    return hmac.digest(_SIGN_KEY, f"{rid}:{name}:{expires}".encode(), "sha256").hex()
+
 # Status endpoint
 @app.get("/status/{request_id}")
 def status(request_id: str, request: Request):
     base_url = str(request.base_url).rstrip('/')
     req_dir = os.path.join(TEMP_DIR, request_id)
-    if not os.path.isdir(req_dir):
+    # One directory listing instead of a stat per artifact
+    try:
+        with os.scandir(req_dir) as it:
+            names = {e.name for e in it if e.is_file()}
+    except (FileNotFoundError, NotADirectoryError):
         raise HTTPException(status_code=404, detail="request_id not found")
-    def exists(name: str) -> bool:
-        return os.path.exists(os.path.join(req_dir, name))
     def build_url(name: str):
         if SIGNED_DOWNLOADS and DOWNLOAD_SIGNING_KEY:
             expires = int(time.time()) + 10 * 60
-            msg = f"{request_id}:{name}:{expires}".encode()
-            sig = hmac.new(DOWNLOAD_SIGNING_KEY.encode(), msg, hashlib.sha256).hexdigest()
+            sig = _sign_download(request_id, name, expires)
             qs = urlencode({"rid": request_id, "file": name, "exp": expires, "sig": sig})
             return f"{base_url}/download?{qs}"
         return f"{base_url}/static/{request_id}/{name}"
     return {
         "request_id": request_id,
-        "summary_pdf": build_url("summary.pdf") if exists("summary.pdf") else None,
-        "graphical_abstract": build_url("graphical_abstract.png") if exists("graphical_abstract.png") else None,
-        "voiceover": build_url("voiceover.mp3") if exists("voiceover.mp3") else None,
-        "presentation": build_url("presentation.pptx") if exists("presentation.pptx") else None,
+        "summary_pdf": build_url("summary.pdf") if "summary.pdf" in names else None,
+        "graphical_abstract": build_url("graphical_abstract.png") if "graphical_abstract.png" in names else None,
+        "voiceover": build_url("voiceover.mp3") if "voiceover.mp3" in names else None,
+        "presentation": build_url("presentation.pptx") if "presentation.pptx" in names else None,
     }
 
 # Signed download endpoint
@@ -574,17 +842,25 @@ def download_signed(rid: str, file: str, exp: int, sig: str):
     if now > exp:
         raise HTTPException(status_code=410, detail="Link expired")
     # Validate signature
-    msg = f"{rid}:{file}:{exp}".encode()
-    expected = hmac.new(DOWNLOAD_SIGNING_KEY.encode(), msg, hashlib.sha256).hexdigest()
+    expected = _sign_download(rid, file, exp)
     if not hmac.compare_digest(expected, sig):
         raise HTTPException(status_code=403, detail="Invalid signature")
     # Prevent path traversal
     if "/" in file or ".." in file:
         raise HTTPException(status_code=400, detail="Invalid file parameter")
     path = os.path.join(TEMP_DIR, rid, file)
-    if not os.path.exists(path):
+    # Single stat, reused by FileResponse for headers instead of a second lookup
+    try:
+        st = os.stat(path)
+    except OSError:
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(path)
+    return FileResponse(
+        path,
+        stat_result=st,
+        filename=file,
+        content_disposition_type="attachment",
+        headers={"Cache-Control": "private, max-age=600"},
+    )
 
 def require_bearer_token(authorization: Optional[str] = Header(default=None)):
     # If no token configured, allow all (development convenience)
@@ -609,50 +885,104 @@ def _rate_limit_check(key: str, now: float) -> bool:
     # Token bucket refill per second
     capacity = RATE_LIMIT_PER_MINUTE
     refill_rate_per_sec = RATE_LIMIT_PER_MINUTE / 60.0
-    bucket = _RATE_BUCKETS.get(key)
-    if not bucket:
-        _RATE_BUCKETS[key] = {"tokens": capacity - 1, "last": now}
-        return True
-    elapsed = max(0.0, now - bucket["last"])
-    bucket["last"] = now
-    bucket["tokens"] = min(capacity, bucket["tokens"] + elapsed * refill_rate_per_sec)
-    if bucket["tokens"] >= 1.0:
-        bucket["tokens"] -= 1.0
-        return True
-    return False
+    with _RATE_BUCKETS_LOCK:
+        bucket = _RATE_BUCKETS.get(key)
+        if not bucket:
+            _RATE_BUCKETS[key] = {"tokens": capacity - 1, "last": now}
+            # Evict the least recently seen client once the cap is reached
+            if len(_RATE_BUCKETS) > MAX_RATE_BUCKETS:
+                _RATE_BUCKETS.popitem(last=False)
+            return True
+        _RATE_BUCKETS.move_to_end(key)
+        elapsed = max(0.0, now - bucket["last"])
+        bucket["last"] = now
+        bucket["tokens"] = min(capacity, bucket["tokens"] + elapsed * refill_rate_per_sec)
+        if bucket["tokens"] >= 1.0:
+            bucket["tokens"] -= 1.0
+            return True
+        return False
 
 def enforce_rate_limit(request: Request, authorization: Optional[str] = Header(default=None)):
     if RATE_LIMIT_PER_MINUTE <= 0:
         return True
     key = _client_key(request, authorization)
-    if _rate_limit_check(key, time.time()):
+    if _rate_limit_check(key, time.monotonic()):
         return True
     raise HTTPException(status_code=429, detail="Too many requests. Please slow down.")
 
 # Extract text from PDF
-def extract_text_from_pdf(pdf_path):
+async def extract_text_from_pdf(pdf_path):
     try:
-        with fitz.open(pdf_path) as doc:
-            texts = []
-            total_pages = len(doc)
-            pages = min(total_pages, MAX_PDF_PAGES)
-            for i in range(pages):
-                texts.append(doc[i].get_text("text"))
-                if sum(len(t) for t in texts) >= MAX_TEXT_CHARS:
-                    break
-            combined = "".join(texts)
-            if len(combined) > MAX_TEXT_CHARS:
-                combined = combined[:MAX_TEXT_CHARS]
-            return combined, total_pages
+        # Count pages in a worker too, so a hostile PDF can only crash the pool, never this process
+        total_pages = await _run_in_pdf_pool(document_workers.count_pages, pdf_path)
+        pages = min(total_pages, MAX_PDF_PAGES)
+        # Strided sharding: each worker opens the document once and takes pages shard, shard+N, ...
+        # Small documents do not need (or pay for) a document open per pool worker
+        num_shards = max(1, min(PDF_EXTRACT_WORKERS, pages))
+        results = await asyncio.gather(*(
+            _run_in_pdf_pool(document_workers.extract_shard, pdf_path, shard, num_shards, MAX_PDF_PAGES, MAX_TEXT_CHARS)
+            for shard in range(num_shards)
+        ))
+        # Reassemble pages in document order, stopping at the first page a shard skipped
+        combined = bytearray()
+        for page in range(pages):
+            buf, page_ends = results[page % num_shards]
+            j = page // num_shards
+            if j >= len(page_ends):
+                break
+            combined += buf[page_ends[j - 1] if j else 0:page_ends[j]]
+        # Decode once at the end; the cap stays in characters
+        return combined.decode("utf-8", "ignore")[:MAX_TEXT_CHARS], total_pages
+    except BrokenProcessPool as e:
+        # A crashed worker is a server fault, not a bad upload; the pool has been replaced
+        logging.error(f"PDF extraction worker crashed: {e}")
+        raise HTTPException(status_code=503, detail="PDF worker crashed, please retry")
     except Exception as e:
         # Fail fast with a clear message for corrupted/invalid PDFs
         msg = str(e).lower()
-        if "cannot open" in msg or "broken" in msg or "corrupt" in msg or "invalid" in msg:
+        if isinstance(e, fitz.FileDataError) or "cannot open" in msg or "broken" in msg or "corrupt" in msg or "invalid" in msg:
             logging.error(f"Invalid or corrupted PDF: {e}")
             raise HTTPException(status_code=400, detail="Invalid or corrupted PDF file")
         logging.error(f"PDF Extraction Error: {str(e)}")
         raise HTTPException(status_code=400, detail="Failed to read PDF file")
 
+# Model output cache helpers
+def _cache_key(text: str, *parts: str) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode())
+        h.update(b"|")
+    h.update(text.strip().encode("utf-8", "ignore"))
+    return h.hexdigest()
+
+def _config_tag(*values) -> str:
+    """Short hash of settings that change a model's output for the same input"""
+    return hashlib.sha256("|".join(map(str, values)).encode()).hexdigest()[:16]
+
+def _cache_path(key: str, ext: str) -> str:
+    return os.path.join(CACHE_DIR, f"{key}.{ext}")
+
+def _cache_write(path: str, data: bytes):
+    # Write to a temp file and rename so readers never see partial entries
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError as e:
+        logging.warning(f"Cache write failed for {path}: {e}")
+
+def _cache_store_file(src: str, path: str):
+    # Copy an already-written artifact into the cache without reading it into memory
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, path)
+    except OSError as e:
+        logging.warning(f"Cache write failed for {path}: {e}")
+
 # Structured error helper
 def _error_response(code: str, message: str, request_id: Optional[str], hint: Optional[str] = None):
     payload = {
@@ -665,24 +995,20 @@ def _error_response(code: str, message: str, request_id: Optional[str], hint: Op
         payload["hint"] = hint
     return payload
 
-# Primary Gemini Summary Function
-def gemini_summary(text, summary_length="medium"):
-    try:
-        if not gemini_model:
-            raise HTTPException(status_code=500, detail="Gemini client not initialized - check GEMINI_API_KEY")
-        
-        # Create appropriate prompt for different lengths
-        length_instructions = {
-            "short": "Provide a concise summary in 200-300 words",
-            "medium": "Provide a detailed summary in 400-600 words", 
-            "long": "Provide a comprehensive summary in 800-1000 words"
-        }
-        length_instruction = length_instructions.get(summary_length, "Provide a detailed summary in 400-600 words")
-        
-        prompt = f"""You are an expert research paper analyst. Analyze this paper and provide a structured, engaging summary. {length_instruction}
+# Summary prompt pieces, built once at import time
+_SUMMARY_LENGTH_INSTRUCTIONS = {
+    "short": "Provide a concise summary in 200-300 words",
+    "medium": "Provide a detailed summary in 400-600 words",
+    "long": "Provide a comprehensive summary in 800-1000 words"
+}
+SUMMARY_PROMPT_HEADERS = {
+    length: f"""You are an expert research paper analyst. Analyze this paper and provide a structured, engaging summary. {instruction}
 
 Research Paper Content:
-{text}
+"""
+    for length, instruction in _SUMMARY_LENGTH_INSTRUCTIONS.items()
+}
+SUMMARY_PROMPT_FOOTER = """
 
 Create a comprehensive summary including:
 
@@ -698,11 +1024,161 @@ Create a comprehensive summary including:
 
 Use clear language while maintaining technical accuracy. Include notable quotes that capture essential insights. Format with clear section headers and bullet points where appropriate to make it easy to understand and compelling to read."""
 
-        response = gemini_model.generate_content(prompt)
+# Paper text trimming: keep the whole abstract/conclusion and the head of every other section
+_CHARS_PER_TOKEN = 4  # rough estimate used for budgeting and rate limiting
+_PAPER_SECTION_NAMES = (
+    "abstract", "introduction", "background", "related work", "materials and methods", "methodology",
+    "methods", "method", "experiments", "experiment", "evaluation", "results", "result", "discussion",
+    "conclusions", "conclusion", "references", "bibliography", "acknowledgements", "acknowledgments",
+    "appendices", "appendix",
+)
+# A header is a short standalone line: optional numbering, then a Capitalized/Title/UPPER section name
+# and at most three more words ("Appendix A: Proofs"); lowercase body lines never match
+_PAPER_SECTION_RE = re.compile(
+    r"^[ \t]*(?:(?:[0-9]+(?:\.[0-9]+)*|[IVX]+|[A-Z])\.?[ \t]+)?"
+    r"(?P<name>" + "|".join(
+        re.escape(variant)
+        for name in _PAPER_SECTION_NAMES
+        for variant in dict.fromkeys((name.capitalize(), name.title(), name.upper()))
+    ) + r")\b"
+    r"(?:[ \t]*[:.\u2014-]?[ \t]+[\w&'-]+){0,3}[ \t]*:?[ \t]*$",
+    re.MULTILINE,
+)
+_PAPER_KEEP_WHOLE = {"abstract", "conclusions", "conclusion"}
+_PAPER_DROP = {"references", "bibliography", "acknowledgements", "acknowledgments", "appendices", "appendix"}
+_ELISION = "\n[...]\n"
+
+def _fit_text_to_budget(text, max_chars):
+    """Trim paper text to max_chars, preferring abstract and conclusions over section tails"""
+    if len(text) <= max_chars:
+        return text
+    headers = list(_PAPER_SECTION_RE.finditer(text))
+    if not headers:
+        # No recognisable headers: keep the opening and the closing (usually the conclusions)
+        budget = max(0, max_chars - len(_ELISION))
+        head = budget * 3 // 4
+        return (text[:head] + _ELISION + text[len(text) - (budget - head):])[:max_chars]
+
+    # Preamble (title, authors) first, then one chunk per header classified by the header's name
+    sections = [(text[:headers[0].start()], False)]
+    for m, nxt in zip(headers, headers[1:] + [None]):
+        name = m.group("name").lower()
+        if name in _PAPER_DROP:
+            continue
+        sections.append((text[m.start():nxt.start() if nxt else len(text)], name in _PAPER_KEEP_WHOLE))
+    sections = [(chunk, whole) for chunk, whole in sections if chunk.strip()]
+
+    # Whole abstract/conclusions first, then split what is left evenly across the other sections
+    remaining = max(0, max_chars - len(_ELISION) * (len(sections) - 1))
+    keep = {}
+    for i, (chunk, whole) in enumerate(sections):
+        if whole:
+            keep[i] = chunk[:remaining]
+            remaining -= len(keep[i])
+    others = [i for i, (_chunk, whole) in enumerate(sections) if not whole]
+    # Sections shorter than their share hand the slack to the longer ones
+    for n, i in enumerate(sorted(others, key=lambda i: len(sections[i][0]))):
+        share = remaining // (len(others) - n)
+        keep[i] = sections[i][0][:share]
+        remaining -= len(keep[i])
+
+    return _ELISION.join(keep[i] for i in range(len(sections)) if keep.get(i))[:max_chars]
+
+# Gemini request gating: bounded concurrency plus a tokens-per-minute budget
+class AsyncTokenBucket:
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = max(1, tokens_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = float(self.capacity)
+        self.last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: int):
+        # Requests larger than the whole bucket only wait for a full bucket
+        amount = min(max(1, amount), self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+_GEMINI_SEM = asyncio.Semaphore(GEMINI_CONCURRENCY)
+_GEMINI_BUCKET = AsyncTokenBucket(GEMINI_TOKENS_PER_MINUTE)
+_GEMINI_RETRYABLE = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.InternalServerError,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+)
+
+# Shared generation settings, built once instead of per call
+_GEMINI_GEN_SETTINGS = {"temperature": 0.4, "max_output_tokens": 8192}
+_GEMINI_GEN_CFG = genai.types.GenerationConfig(**_GEMINI_GEN_SETTINGS)
+# Everything besides the paper text that shapes a summary; part of the summary cache key
+_SUMMARY_CONFIG_TAG = _config_tag(
+    getattr(gemini_model, "model_name", ""),
+    GEMINI_INPUT_TOKEN_BUDGET,
+    *SUMMARY_PROMPT_HEADERS.values(),
+    SUMMARY_PROMPT_FOOTER,
+    json.dumps(_GEMINI_GEN_SETTINGS, sort_keys=True),
+)
+
+async def _gemini_generate(parts, estimated_tokens: int) -> str:
+    """Stream a Gemini completion under the concurrency/TPM limits, retrying 429/5xx with backoff"""
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        try:
+            async with _GEMINI_SEM:
+                await _GEMINI_BUCKET.acquire(estimated_tokens)
+                response = await gemini_model.generate_content_async(
+                    parts, generation_config=_GEMINI_GEN_CFG, stream=True
+                )
+                pieces = []
+                async for chunk in response:
+                    try:
+                        piece = chunk.text
+                    except ValueError:
+                        # Chunks carrying only finish/safety metadata have no text parts
+                        continue
+                    if piece:
+                        pieces.append(piece)
+                return "".join(pieces)
+        except _GEMINI_RETRYABLE as e:
+            if attempt >= GEMINI_MAX_RETRIES:
+                raise
+            delay = min(30, 2 ** attempt) + random.uniform(0, 1)
+            logging.warning(f"Gemini transient error ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+# Primary Gemini Summary Function
+async def gemini_summary(text, summary_length="medium"):
+    try:
+        if not gemini_model:
+            raise HTTPException(status_code=500, detail="Gemini client not initialized - check GEMINI_API_KEY")
+        
+        cache_file = _cache_path(_cache_key(text, "summary", summary_length, _SUMMARY_CONFIG_TAG), "txt")
+        if os.path.exists(cache_file):
+            with open(cache_file, "r", encoding="utf-8") as f:
+                logging.info("Gemini summary served from cache.")
+                return f.read()
+
+        # Pass the paper as its own content part instead of splicing it into one huge prompt string
+        prompt_header = SUMMARY_PROMPT_HEADERS.get(summary_length, SUMMARY_PROMPT_HEADERS["medium"])
+        paper_text = _fit_text_to_budget(text, GEMINI_INPUT_TOKEN_BUDGET * _CHARS_PER_TOKEN)
+        if len(paper_text) < len(text):
+            logging.info(f"Paper text trimmed from {len(text)} to {len(paper_text)} chars for Gemini")
+        parts = [prompt_header, paper_text, SUMMARY_PROMPT_FOOTER]
+        estimated_tokens = sum(len(part) for part in parts) // _CHARS_PER_TOKEN
+        summary = await _gemini_generate(parts, estimated_tokens)
         
-        if response and response.text:
+        if summary:
             logging.info("Gemini summary generated successfully.")
-            return response.text
+            _cache_write(cache_file, summary.encode("utf-8"))
+            return summary
         else:
             raise Exception("No response generated from Gemini")
             
@@ -720,57 +1196,58 @@ Use clear language while maintaining technical accuracy. Include notable quotes
         else:
             raise HTTPException(status_code=500, detail=f"Gemini API Error: {error_msg}")
 
+# Section header detection: lookahead alternatives are tried in order, so the
+# first matching section wins exactly like the sequential keyword checks did
+_SECTION_HEADER_RE = re.compile(
+    r"^(?:"
+    r"(?=.*?finding)(?P<kf>)"
+    r"|(?=.*?(?:method|approach))(?P<me>)"
+    r"|(?=.*?(?:conclusion|conclude))(?P<co>)"
+    r"|(?=.*?(?:implication|impact|significance))(?P<im>)"
+    r")",
+    re.IGNORECASE,
+)
+_SECTION_GROUPS = {"kf": "Key Findings", "me": "Methodology", "co": "Conclusions", "im": "Implications"}
+# Markdown emphasis, bullets and dashes removed from content lines
+_SECTION_STRIP_TABLE = str.maketrans("", "", "*•-")
+_SECTION_NAMES = ("Key Findings", "Methodology", "Conclusions", "Implications")
+_SECTION_PLACEHOLDER = "Content not explicitly separated in the original summary"
+
 def format_summary_sections(summary):
     """Format the summary into structured sections using simple text parsing"""
-    sections = {
-        "Key Findings": [],
-        "Methodology": [],
-        "Conclusions": [],
-        "Implications": []
-    }
+    sections = {name: [] for name in _SECTION_NAMES}
     
     try:
-        # Split the summary into lines and clean them
-        lines = [line.strip() for line in summary.split('\n') if line.strip()]
+        # Split the summary into lines and clean them (strip each line once)
+        lines = [line for line in map(str.strip, summary.split('\n')) if line]
         
         current_section = None
+        found_any = False
         
         # Parse the summary looking for section headers and content
         for line in lines:
-            line_lower = line.lower()
-            
             # Check for section headers (including markdown format)
-            if any(keyword in line_lower for keyword in ['**key finding', 'key finding', '**finding', 'finding']):
-                current_section = "Key Findings"
-                continue
-            elif any(keyword in line_lower for keyword in ['**methodolog', 'methodolog', '**method', 'method', 'approach']):
-                current_section = "Methodology"
-                continue
-            elif any(keyword in line_lower for keyword in ['**conclusion', 'conclusion', '**conclude', 'conclude']):
-                current_section = "Conclusions"
-                continue
-            elif any(keyword in line_lower for keyword in ['**implication', 'implication', '**impact', 'impact', 'significance']):
-                current_section = "Implications"
+            header = _SECTION_HEADER_RE.match(line)
+            if header:
+                current_section = _SECTION_GROUPS[header.lastgroup]
                 continue
             elif current_section and line and len(line) > 10:
                 # Clean up markdown formatting and bullet points
-                clean_line = line.replace('**', '').replace('*', '').replace('•', '').replace('-', '').strip()
+                clean_line = line.translate(_SECTION_STRIP_TABLE).strip()
                 if clean_line:
                     sections[current_section].append(clean_line)
+                    found_any = True
         
         # If no clear sections were found, split content into paragraphs and distribute
-        if all(len(section) == 0 for section in sections.values()):
-            paragraphs = [p.strip() for p in summary.split('\n\n') if p.strip() and len(p.strip()) > 20]
-            section_names = list(sections.keys())
-            
+        if not found_any:
+            paragraphs = [p for p in map(str.strip, summary.split('\n\n')) if len(p) > 20]
             for i, paragraph in enumerate(paragraphs):
-                section_index = i % len(section_names)
-                sections[section_names[section_index]].append(paragraph)
+                sections[_SECTION_NAMES[i % len(_SECTION_NAMES)]].append(paragraph)
         
         # Ensure each section has at least some content
-        for section_name in sections:
-            if not sections[section_name]:
-                sections[section_name] = ["Content not explicitly separated in the original summary"]
+        for section_name, points in sections.items():
+            if not points:
+                sections[section_name] = [_SECTION_PLACEHOLDER]
                 
         logging.info("Summary sections formatted successfully without additional AI processing")
         return sections
@@ -785,155 +1262,468 @@ def format_summary_sections(summary):
             "Implications": ["See main summary for details"]
         }
 
-class SummaryPDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 15)
-        self.cell(0, 10, 'PaperSynth - Research Summary', 0, 1, 'C')
-        self.ln(10)
-        
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Generated on {datetime.now().strftime("%Y-%m-%d %H:%M")} - Page {self.page_no()}', 0, 0, 'C')
-
-def save_summary_to_pdf(summary, output_path):
+async def save_summary_to_pdf(sections, output_path):
     try:
-        pdf = SummaryPDF()
-        pdf.add_page()
-        
-        # Format the summary into sections
-        sections = format_summary_sections(summary)
-        
-        # Add formatted content using standard dash
-        for section, points in sections.items():
-            # Section header
-            pdf.set_font('Arial', 'B', 14)
-            pdf.cell(0, 10, section, ln=True)
-            pdf.ln(5)
-            
-            # Section content
-            pdf.set_font('Arial', '', 12)
-            for point in points:
-                # Clean the text of any problematic characters
-                clean_point = point.encode('ascii', 'replace').decode()
-                # Add content with dash instead of bullet
-                pdf.multi_cell(0, 10, f"- {clean_point}")
-            pdf.ln(5)
-        
-        pdf.output(output_path)
+        await _run_in_pdf_pool(document_workers.render_summary_pdf, sections, output_path)
+        _record_artifact(output_path)
         logging.info(f"Summary saved to {output_path}")
         return output_path
+    except BrokenProcessPool as e:
+        logging.error(f"Summary PDF worker crashed: {e}")
+        raise HTTPException(status_code=503, detail="Document worker crashed, please retry")
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error saving summary to PDF: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error saving summary to PDF: {str(e)}")
-def generate_graphical_abstract(summary, pipe, request_dir, preset="balanced"):
-    try:
-        # Create a more focused prompt for research visualization
-        prompt = f"""Create a scientific graphical abstract visualization:
+
+# SDXL generation presets
+SDXL_PRESETS = {
+    "fast": {"steps": 20, "size": 384},
+    "balanced": {"steps": 30, "size": 512},
+    "quality": {"steps": 50, "size": 768},
+}
+
+# Graphical abstract prompt around the first 300 summary characters (focused on research visualization)
+SDXL_PROMPT_PREFIX = """Create a scientific graphical abstract visualization:
         A clean, professional diagram showing:
-        {summary[:300]}
+        """
+SDXL_PROMPT_SUFFIX = """
         Style: Modern scientific illustration, minimalist, clear layout, professional colors
         Include: Relevant scientific symbols, data visualization elements, and clear visual hierarchy
         """
 
-        negative_prompt = "text, words, blurry, low quality, distorted, messy, cluttered"
+SDXL_NEGATIVE_PROMPT = "text, words, blurry, low quality, distorted, messy, cluttered"
 
-        # Choose parameters by preset
-        if preset not in {"fast", "balanced", "quality"}:
-            preset = "balanced"
-        params = {
-            "fast": {"steps": 20, "size": 384},
-            "balanced": {"steps": 30, "size": 512},
-            "quality": {"steps": 50, "size": 768},
-        }[preset]
+# Pending SDXL batch per preset as ([(prompt, future), ...], window timer), flushed as one pipeline call
+_SDXL_PENDING = {}
+# Running flush tasks; the loop only keeps weak references to tasks
+_SDXL_FLUSH_TASKS = set()
 
-        try:
+def _negative_prompt_kwargs(batch_size):
+    if _SDXL_NEG_EMBEDS is None:
+        return {"negative_prompt": [SDXL_NEGATIVE_PROMPT] * batch_size}
+    embeds, pooled = _SDXL_NEG_EMBEDS
+    return {
+        "negative_prompt_embeds": embeds.repeat(batch_size, 1, 1),
+        "negative_pooled_prompt_embeds": pooled.repeat(batch_size, 1),
+    }
+
+def _run_sdxl_batch(pipe, prompts, preset):
+    """Run one batched SDXL call (on the SDXL executor thread) and return one image per prompt"""
+    params = SDXL_PRESETS[preset]
+    count = len(prompts)
+    # Pad to a warmed batch size so a compiled pipeline never captures a new graph mid-request
+    prompts = list(prompts) + [prompts[-1]] * (_sdxl_batch_bucket(count) - count)
+    negative = _negative_prompt_kwargs(len(prompts))
+    # One seeded generator per image keeps results independent of batch composition;
+    # seeding on the execution device avoids the global CPU RNG and a host->GPU noise copy
+    device = pipe._execution_device
+    generators = [torch.Generator(device=device).manual_seed(42) for _ in prompts]
+    try:
+        with torch.inference_mode():
             output = pipe(
-                prompt=prompt,
-                negative_prompt=negative_prompt,
+                prompt=prompts,
+                **negative,
                 num_inference_steps=params["steps"],
                 guidance_scale=7.5,
                 height=params["size"],
                 width=params["size"],
-                generator=torch.manual_seed(42)
+                generator=generators
             )
-        except torch.cuda.OutOfMemoryError:
-            # Fallback smaller/fewer steps
-            fallback_size = 384 if params["size"] > 384 else 256
-            fallback_steps = 20 if params["steps"] > 20 else 15
+    except torch.cuda.OutOfMemoryError:
+        # Fallback smaller/fewer steps
+        fallback_size = 384 if params["size"] > 384 else 256
+        fallback_steps = 20 if params["steps"] > 20 else 15
+        generators = [torch.Generator(device=device).manual_seed(42) for _ in prompts]
+        with torch.inference_mode():
             output = pipe(
-                prompt=prompt,
-                negative_prompt=negative_prompt,
+                prompt=prompts,
+                **negative,
                 num_inference_steps=fallback_steps,
                 guidance_scale=7.5,
                 height=fallback_size,
                 width=fallback_size,
-                generator=torch.manual_seed(42)
+                generator=generators
             )
+    if len(output.images) != len(prompts):
+        raise ValueError("No images generated")
+    return output.images[:count]
+
+def _flush_sdxl_batch(pipe, preset):
+    """Detach the pending batch for preset (window expired or batch full) and start generating it"""
+    pending = _SDXL_PENDING.pop(preset, None)
+    if pending is None:
+        return
+    batch, timer = pending
+    # An early flush must not leave the timer armed to cut the next batch's window short
+    timer.cancel()
+    task = asyncio.get_running_loop().create_task(_run_sdxl_flush(pipe, preset, batch))
+    _SDXL_FLUSH_TASKS.add(task)
+    task.add_done_callback(_SDXL_FLUSH_TASKS.discard)
+
+async def _run_sdxl_flush(pipe, preset, batch):
+    prompts = [prompt for prompt, _fut in batch]
+    try:
+        images = await asyncio.get_running_loop().run_in_executor(
+            _SDXL_EXECUTOR, _run_sdxl_batch, pipe, prompts, preset
+        )
+    except Exception as e:
+        for _prompt, fut in batch:
+            if not fut.done():
+                fut.set_exception(e)
+        return
+    logging.info(f"SDXL batch of {len(batch)} generated (preset={preset})")
+    for (_prompt, fut), image in zip(batch, images):
+        if not fut.done():
+            fut.set_result(image)
+
+async def _generate_sdxl_image(pipe, prompt, preset):
+    """Queue a prompt; requests arriving within SDXL_BATCH_WINDOW_MS share one pipeline call"""
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    pending = _SDXL_PENDING.get(preset)
+    if pending is None:
+        timer = loop.call_later(SDXL_BATCH_WINDOW_MS / 1000.0, _flush_sdxl_batch, pipe, preset)
+        pending = _SDXL_PENDING[preset] = ([], timer)
+    batch = pending[0]
+    batch.append((prompt, fut))
+    if len(batch) >= SDXL_MAX_BATCH:
+        _flush_sdxl_batch(pipe, preset)
+    return await fut
+
+async def generate_graphical_abstract(summary, pipe, request_dir, preset="balanced"):
+    try:
+        prompt = "".join((SDXL_PROMPT_PREFIX, summary[:300], SDXL_PROMPT_SUFFIX))
 
-        if not output.images:
-            raise ValueError("No images generated")
+        # Choose parameters by preset
+        if preset not in SDXL_PRESETS:
+            preset = "balanced"
 
-        image = output.images[0]
+        image = await _generate_sdxl_image(pipe, prompt, preset)
         graphical_abstract_path = os.path.join(request_dir, "graphical_abstract.png")
-        image.save(graphical_abstract_path, quality=95)
+        # PNG ignores quality; a low zlib level trades a little size for a much faster encode
+        await asyncio.to_thread(
+            document_workers.write_replacing, graphical_abstract_path,
+            lambda tmp: image.save(tmp, "PNG", optimize=False, compress_level=1),
+        )
+        _record_artifact(graphical_abstract_path)
         return graphical_abstract_path
     except Exception as e:
         logging.error(f"Graphical Abstract Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate graphical abstract: {str(e)}")
 
 # AI Voiceover
-def generate_voice(summary, request_dir):
+TTS_VOICE_ID = "pFZP5JQG7iQjIQuC4Bku"  # "Lily" premade voice
+TTS_MODEL = os.getenv("ELEVENLABS_MODEL", "eleven_turbo_v2_5")
+TTS_SEGMENT_CHARS = int(os.getenv("TTS_SEGMENT_CHARS", "1000"))
+TTS_CONCURRENCY = max(1, int(os.getenv("TTS_CONCURRENCY", "3")))
+_TTS_SEM = asyncio.Semaphore(TTS_CONCURRENCY)
+# Voice, model and segmentation shape the audio; part of the voiceover cache key
+_TTS_CONFIG_TAG = _config_tag(TTS_VOICE_ID, TTS_MODEL, TTS_SEGMENT_CHARS)
+
+# Sentence boundary: ., ! or ? followed by whitespace, except after common abbreviations
+_SENTENCE_SPLIT_RE = re.compile(
+    r"(?<=[.!?])(?<!\bDr\.)(?<!\bMr\.)(?<!\bMrs\.)(?<!\bMs\.)(?<!\bvs\.)(?<!\be\.g\.)(?<!\bi\.e\.)(?<!\bal\.)\s+"
+)
+
+def _split_tts_segments(text):
+    """Pack whole sentences into segments of at most TTS_SEGMENT_CHARS characters"""
+    segments = []
+    current = ""
+    for sentence in _SENTENCE_SPLIT_RE.split(text.strip()):
+        if not sentence:
+            continue
+        if current and len(current) + len(sentence) + 1 > TTS_SEGMENT_CHARS:
+            segments.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        segments.append(current)
+    return segments
+
+TTS_WRITE_BUFFER = 1024 * 1024
+
+def _concat_files(part_paths, output_path):
+    with open(output_path, "wb") as out:
+        for part in part_paths:
+            with open(part, "rb") as src:
+                size = os.fstat(src.fileno()).st_size
+                offset = 0
+                try:
+                    # Kernel-side copy; the audio never passes through Python buffers
+                    while offset < size:
+                        sent = os.sendfile(out.fileno(), src.fileno(), offset, size - offset)
+                        if sent == 0:
+                            break
+                        offset += sent
+                except (AttributeError, OSError):
+                    # No file-to-file sendfile on this platform
+                    src.seek(offset)
+                    out.seek(0, os.SEEK_END)
+                    shutil.copyfileobj(src, out, TTS_WRITE_BUFFER)
+
+async def generate_voice(summary, request_dir):
     try:
-        if not ElevenLabs:
+        if not AsyncElevenLabs:
             raise HTTPException(status_code=500, detail="ElevenLabs package not available. Install with: pip install elevenlabs")
         if not ELEVENLABS_API_KEY:
             raise HTTPException(status_code=500, detail="ElevenLabs API key not configured")
         
-        client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
-        audio = client.generate(
-            text=summary,
-            voice="Lily",
-            model="eleven_monolingual_v1"
-        )
         voiceover_path = os.path.join(request_dir, "voiceover.mp3")
-        with open(voiceover_path, "wb") as f:
-            f.write(audio)
+        cache_file = _cache_path(_cache_key(summary, "tts", _TTS_CONFIG_TAG), "mp3")
+        if os.path.exists(cache_file):
+            shutil.copyfile(cache_file, voiceover_path)
+            _record_artifact(voiceover_path)
+            logging.info("Voiceover served from cache.")
+            return voiceover_path
+
+        client = _get_tts_client()
+
+        async def _synthesize(index, segment):
+            # Each segment streams to its own part file; MP3 frames concatenate cleanly
+            part_path = f"{voiceover_path}.part{index}"
+            async with _TTS_SEM:
+                stream = client.text_to_speech.convert_as_stream(
+                    voice_id=TTS_VOICE_ID,
+                    text=segment,
+                    model_id=TTS_MODEL,
+                    optimize_streaming_latency=3
+                )
+                # Large buffer: the SDK yields small chunks, so batch them into few write calls
+                with open(part_path, "wb", buffering=TTS_WRITE_BUFFER) as f:
+                    async for chunk in stream:
+                        if chunk:
+                            f.write(chunk)
+            return part_path
+
+        segments = _split_tts_segments(summary)
+        part_paths = [f"{voiceover_path}.part{i}" for i in range(len(segments))]
+        partial_path = f"{voiceover_path}.part"
+        # Synthesize sentence segments concurrently, then stitch them in order
+        tasks = [asyncio.create_task(_synthesize(i, seg)) for i, seg in enumerate(segments)]
+        try:
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # Stop the sibling streams (and their credit spend) and let them close their files
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            await asyncio.to_thread(_concat_files, part_paths, partial_path)
+            # Rename only once every segment completed
+            os.replace(partial_path, voiceover_path)
+            _record_artifact(voiceover_path)
+        finally:
+            for leftover in part_paths + [partial_path]:
+                try:
+                    os.remove(leftover)
+                except OSError:
+                    # Missing part or a file still locked; never mask the original error
+                    pass
+        _cache_store_file(voiceover_path, cache_file)
         return voiceover_path
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Voiceover Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate voiceover: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Voiceover Error: {str(e)}")
 
 # Generate Presentation
-def generate_presentation(summary, request_dir):
+async def generate_presentation(sections, request_dir):
     try:
-        prs = Presentation()
-        
-        # Title slide
-        title_slide = prs.slides.add_slide(prs.slide_layouts[0])
-        title_slide.shapes.title.text = "PaperSynth - Research Summary"
-        title_slide.placeholders[1].text = "Generated Summary Presentation"
-        
-        # Summary sections
-        sections = format_summary_sections(summary)
-        for section, points in sections.items():
-            slide = prs.slides.add_slide(prs.slide_layouts[1])
-            slide.shapes.title.text = section
-            text_frame = slide.placeholders[1].text_frame
-            
-            for point in points:
-                p = text_frame.add_paragraph()
-                p.text = f"• {point}"
-                p.level = 0
-        
         presentation_path = os.path.join(request_dir, "presentation.pptx")
-        prs.save(presentation_path)
+        await _run_in_pdf_pool(document_workers.render_presentation, sections, presentation_path)
+        _record_artifact(presentation_path)
         return presentation_path
+    except BrokenProcessPool as e:
+        logging.error(f"Presentation worker crashed: {e}")
+        raise HTTPException(status_code=503, detail="Document worker crashed, please retry")
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Presentation Generation Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Presentation Generation Error: {str(e)}")
 
+# Upload handling
+class _LimitedReader:
+    """File wrapper that hashes what it reads and fails once the byte limit is exceeded"""
+    def __init__(self, src, limit, digest):
+        self._src = src
+        self._limit = limit
+        self._digest = digest
+        self.total = 0
+
+    def read(self, size=-1):
+        chunk = self._src.read(size)
+        self.total += len(chunk)
+        if self.total > self._limit:
+            raise HTTPException(status_code=413, detail="File too large. Max 10 MB")
+        self._digest.update(chunk)
+        return chunk
+
+def _save_upload(src, dst_path, limit):
+    """Copy an upload to disk (runs in a worker thread); returns its SHA-256 hex digest"""
+    digest = hashlib.sha256()
+    with open(dst_path, "wb") as dst:
+        shutil.copyfileobj(_LimitedReader(src, limit, digest), dst, 1024 * 1024)
+    return digest.hexdigest()
+
+# Whole-request artifact cache: CACHE_DIR/artifacts/<key>/ holds the outputs plus result.json
+def _link_or_copy(src, dst):
+    """Hard-link src to dst (sharing the cached blocks), copying across filesystems; True if linked"""
+    try:
+        os.link(src, dst)
+        return True
+    except OSError:
+        shutil.copyfile(src, dst)
+        return False
+
+# Settings that change the outputs without changing the upload; part of every artifact cache key
+_ARTIFACT_CONFIG_TAG = _config_tag(
+    _SUMMARY_CONFIG_TAG,
+    SDXL_PROMPT_PREFIX,
+    SDXL_PROMPT_SUFFIX,
+    SDXL_NEGATIVE_PROMPT,
+    json.dumps(SDXL_PRESETS, sort_keys=True),
+    _TTS_CONFIG_TAG,
+)
+
+def _artifact_cache_lookup(key, request_dir):
+    """Materialize a cached result into request_dir; returns its metadata or None on a miss"""
+    entry = os.path.join(ARTIFACT_CACHE_DIR, key)
+    try:
+        with open(os.path.join(entry, "result.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    materialized = []
+    copied = []
+    try:
+        for name in ARTIFACT_FILES:
+            src = os.path.join(entry, name)
+            if os.path.exists(src):
+                dst = os.path.join(request_dir, name)
+                materialized.append(dst)
+                if not _link_or_copy(src, dst):
+                    copied.append(dst)
+        os.utime(entry)  # LRU: mark as recently used
+    except OSError as e:
+        # Undo a partial hit so the fresh run cannot write into inodes shared with the cache entry
+        logging.warning(f"Artifact cache lookup failed for {key}: {e}")
+        for path in materialized:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return None
+    # Linked files are already charged to the cache entry
+    for path in copied:
+        _record_artifact(path)
+    return meta
+
+def _artifact_cache_store(key, request_dir, meta):
+    entry = os.path.join(ARTIFACT_CACHE_DIR, key)
+    tmp = os.path.join(ARTIFACT_CACHE_DIR, f".{key}.{uuid.uuid4().hex}.tmp")
+    try:
+        os.makedirs(tmp)
+        linked = {}
+        for name in ARTIFACT_FILES:
+            src = os.path.join(request_dir, name)
+            if os.path.exists(src):
+                linked[name] = _link_or_copy(src, os.path.join(tmp, name))
+        with open(os.path.join(tmp, "result.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        # Atomic publish; if another worker won the race, keep theirs
+        os.rename(tmp, entry)
+        for name, was_linked in linked.items():
+            if was_linked:
+                # Same blocks as the cache entry, which the cache budget now accounts for
+                _release_artifact(os.path.join(request_dir, name))
+    except OSError as e:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(entry):
+            logging.warning(f"Artifact cache store failed for {key}: {e}")
+        return
+    _evict_cache()
+
+def _evict_cache():
+    """Keep CACHE_DIR under CACHE_SIZE_CAP_BYTES and ARTIFACT_CACHE_MAX_ENTRIES, least recently used first"""
+    items = []  # (mtime, size, path, is_artifact_entry)
+    seen = set()
+    try:
+        if os.path.isdir(ARTIFACT_CACHE_DIR):
+            with os.scandir(ARTIFACT_CACHE_DIR) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False) and not e.name.startswith("."):
+                        items.append((e.stat().st_mtime, _get_dir_size_bytes(e.path, seen), e.path, True))
+        with os.scandir(CACHE_DIR) as it:
+            for e in it:
+                if e.is_file(follow_symlinks=False) and not e.name.endswith(".tmp"):
+                    st = e.stat(follow_symlinks=False)
+                    items.append((st.st_mtime, st.st_size, e.path, False))
+    except OSError as e:
+        logging.warning(f"Could not scan {CACHE_DIR}: {e}")
+        return
+    total = sum(item[1] for item in items)
+    entries = sum(1 for item in items if item[3])
+    items.sort()
+    for _mtime, size, path, is_entry in items:
+        over_size = total > CACHE_SIZE_CAP_BYTES
+        if not over_size and entries <= ARTIFACT_CACHE_MAX_ENTRIES:
+            break
+        if not over_size and not is_entry:
+            continue  # only the entry count is over
+        if is_entry:
+            shutil.rmtree(path, ignore_errors=True)
+            entries -= 1
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
+
+def _build_process_result(request, request_id, summary, pages, speaker_notes, warnings):
+    # Derive base URL from request (respects proxies if headers set)
+    base_url = str(request.base_url).rstrip('/')
+    def build_url(filename: Optional[str]):
+        if not filename:
+            return None
+        if SIGNED_DOWNLOADS and DOWNLOAD_SIGNING_KEY:
+            expires = int(time.time()) + 15 * 60  # 15 minutes
+            payload = {"rid": request_id, "file": filename, "exp": expires}
+            sig = _sign_download(request_id, filename, expires)
+            qs = urlencode({**payload, "sig": sig})
+            return f"{base_url}/download?{qs}"
+        else:
+            return f"{base_url}/static/{request_id}/{filename}"
+
+    return {
+        "request_id": request_id,
+        "summary": summary,
+        "pages": pages,
+        "summary_pdf": build_url("summary.pdf"),
+        "graphical_abstract": build_url("graphical_abstract.png"),
+        "voiceover": build_url("voiceover.mp3"),
+        "presentation": build_url("presentation.pptx"),
+        "features": {"sdxl": ENABLE_SDXL, "tts": ENABLE_TTS, "signed_downloads": SIGNED_DOWNLOADS},
+        "speaker_notes": speaker_notes,
+        "warnings": warnings,
+    }
+
+# Pipeline stage helpers
+async def _timed_stage(request_id, label, awaitable):
+    t = time.perf_counter()
+    result = await awaitable
+    logging.info(f"[{request_id}] {label}={(time.perf_counter()-t)*1000:.0f}")
+    return result
+
+async def _no_stage():
+    return None
+
 # FastAPI Route
 @app.post("/process-paper/")
 async def process_paper(
@@ -946,6 +1736,7 @@ async def process_paper(
     _: bool = Depends(require_bearer_token),
     __: bool = Depends(enforce_rate_limit),
 ):
+    inflight = None
     try:
         # Concurrency gate
         await _CONC_SEM.acquire()
@@ -953,12 +1744,13 @@ async def process_paper(
         request_id = uuid.uuid4().hex
         request_dir = os.path.join(TEMP_DIR, request_id)
         os.makedirs(request_dir, exist_ok=True)
+        _track_dir(request_dir)
         
         # Initialize warnings list early
         warnings = []
 
         # Validate preset
-        if sdxl_preset not in {"fast", "balanced", "quality"}:
+        if sdxl_preset not in SDXL_PRESETS:
             sdxl_preset = "balanced"
 
         # Determine which features to run (env gate + request flag)
@@ -987,112 +1779,142 @@ async def process_paper(
         if file.content_type and file.content_type not in ("application/pdf", "application/x-pdf", "application/acrobat", "applications/pdf", "text/pdf", "text/x-pdf"):
             raise HTTPException(status_code=400, detail="Uploaded file does not appear to be a PDF")
 
+        # Reject oversized uploads up front when the size is already known
+        if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="File too large. Max 10 MB")
+
         file_path = os.path.join(request_dir, "paper.pdf")
-        with open(file_path, "wb") as f:
-            total = 0
-            while True:
-                chunk = file.file.read(1024 * 1024)
-                if not chunk:
-                    break
-                total += len(chunk)
-                if total > MAX_UPLOAD_BYTES:
-                    raise HTTPException(status_code=413, detail="File too large. Max 10 MB")
-                f.write(chunk)
+        try:
+            pdf_digest = await asyncio.to_thread(_save_upload, file.file, file_path, MAX_UPLOAD_BYTES)
+        finally:
+            _record_artifact(file_path)
+
+        # Coalesce with an identical request already in flight (no await between lookup and insert)
+        inflight_key = f"{pdf_digest}:{summary_length}:{want_visual}:{want_audio}:{sdxl_preset}"
+        leader = _INFLIGHT.get(inflight_key)
+        if leader is not None:
+            logging.info(f"[{request_id}] Coalescing with in-flight identical request")
+            _remove_request_dir(request_dir)
+            try:
+                return await asyncio.shield(leader)
+            except asyncio.CancelledError:
+                # Our own cancellation (client gone) propagates; a cancelled leader gets a structured 503
+                if not leader.cancelled():
+                    raise
+                logging.warning(f"[{request_id}] Coalesced request was cancelled before finishing")
+                raise HTTPException(status_code=503, detail=_error_response(
+                    "COALESCED_REQUEST_CANCELLED", "The identical in-flight request was cancelled", request_id,
+                    hint="Please retry the upload"
+                ))
+        inflight = asyncio.get_running_loop().create_future()
+        _INFLIGHT[inflight_key] = inflight
+
+        # Serve every artifact from the on-disk cache when this exact upload was processed before
+        artifact_key = f"{pdf_digest}_{summary_length}_{int(want_visual)}{int(want_audio)}_{sdxl_preset}_{_ARTIFACT_CONFIG_TAG}"
+        cached = await asyncio.to_thread(_artifact_cache_lookup, artifact_key, request_dir)
+        if cached is not None:
+            logging.info(f"[{request_id}] Served from artifact cache")
+            # Keep this request's own warnings (e.g. SDXL_LOAD_FAILED turned the visual off)
+            warnings.extend(w for w in cached["warnings"] if w not in warnings)
+            result = _build_process_result(
+                request, request_id, cached["summary"], cached["pages"], cached["speaker_notes"], warnings
+            )
+            inflight.set_result(result)
+            return result
 
         try:
             t0 = time.perf_counter()
-            text, pdf_page_count = extract_text_from_pdf(file_path)
+            text, pdf_page_count = await extract_text_from_pdf(file_path)
             logging.info(f"[{request_id}] pdf_extract_ms={(time.perf_counter()-t0)*1000:.0f} pages={pdf_page_count}")
         except HTTPException as he:
-            code = "PDF_INVALID" if he.detail == "Invalid or corrupted PDF file" else "PDF_READ_FAILED"
+            if he.status_code >= 500:
+                code = "PDF_WORKER_FAILED"
+            elif he.detail == "Invalid or corrupted PDF file":
+                code = "PDF_INVALID"
+            else:
+                code = "PDF_READ_FAILED"
             logging.error(f"[{request_id}] PDF error: {he.detail}")
             raise HTTPException(status_code=he.status_code, detail=_error_response(code, str(he.detail), request_id))
 
         try:
             t1 = time.perf_counter()
-            summary = gemini_summary(text, summary_length)
+            summary = await gemini_summary(text, summary_length)
             logging.info(f"[{request_id}] summarize_ms={(time.perf_counter()-t1)*1000:.0f}")
         except HTTPException as he:
             logging.error(f"[{request_id}] Summarization error: {he.detail}")
             raise HTTPException(status_code=he.status_code, detail=_error_response("SUMMARY_FAILED", "Failed to generate summary", request_id))
         
-        # Generate all outputs
+        # Generate all outputs concurrently; each stage only depends on the summary
         summary_pdf_path = os.path.join(request_dir, "summary.pdf")
-        t2 = time.perf_counter()
-        save_summary_to_pdf(summary, summary_pdf_path)
-        logging.info(f"[{request_id}] pdf_summary_ms={(time.perf_counter()-t2)*1000:.0f}")
+        # Parse once; the PDF and the slides share the same sections
+        sections = format_summary_sections(summary)
+        pdf_result, pptx_result, visual_result, audio_result = await asyncio.gather(
+            _timed_stage(request_id, "pdf_summary_ms", save_summary_to_pdf(sections, summary_pdf_path)),
+            _timed_stage(request_id, "pptx_ms", generate_presentation(sections, request_dir)),
+            _timed_stage(request_id, "sdxl_ms", generate_graphical_abstract(
+                summary, pipe, request_dir, preset=sdxl_preset
+            )) if want_visual and pipe is not None else _no_stage(),
+            _timed_stage(request_id, "tts_ms", generate_voice(summary, request_dir)) if want_audio else _no_stage(),
+            return_exceptions=True,
+        )
 
-        if want_visual and pipe is not None:
-            try:
-                t3 = time.perf_counter()
-                graphical_abstract_path = generate_graphical_abstract(summary, pipe, request_dir, preset=sdxl_preset)
-                logging.info(f"[{request_id}] sdxl_ms={(time.perf_counter()-t3)*1000:.0f}")
-            except Exception as he:
-                logging.error(f"[{request_id}] SDXL error: {getattr(he, 'detail', he)}")
-                graphical_abstract_path = None
-                warnings.append("SDXL_FAILED: Graphical abstract generation failed")
-        else:
+        if isinstance(pdf_result, BaseException):
+            raise pdf_result
+
+        if isinstance(visual_result, BaseException):
+            logging.error(f"[{request_id}] SDXL error: {getattr(visual_result, 'detail', visual_result)}")
             graphical_abstract_path = None
+            warnings.append("SDXL_FAILED: Graphical abstract generation failed")
+        else:
+            graphical_abstract_path = visual_result
 
         speaker_notes = None
-        if want_audio:
-            try:
-                t4 = time.perf_counter()
-                voiceover_path = generate_voice(summary, request_dir)
-                logging.info(f"[{request_id}] tts_ms={(time.perf_counter()-t4)*1000:.0f}")
-            except Exception as he:
-                logging.error(f"[{request_id}] TTS error: {getattr(he, 'detail', he)}")
-                voiceover_path = None
-                speaker_notes = summary  # provide plain text as a fallback
-                warnings.append("TTS_FAILED: Audio generation failed; provided speaker_notes instead")
-        else:
+        if isinstance(audio_result, BaseException):
+            logging.error(f"[{request_id}] TTS error: {getattr(audio_result, 'detail', audio_result)}")
             voiceover_path = None
-
-        try:
-            t5 = time.perf_counter()
-            presentation_path = generate_presentation(summary, request_dir)
-            logging.info(f"[{request_id}] pptx_ms={(time.perf_counter()-t5)*1000:.0f}")
-        except HTTPException as he:
-            logging.error(f"[{request_id}] PPTX error: {he.detail}")
-            raise HTTPException(status_code=he.status_code, detail=_error_response("PRESENTATION_FAILED", "Failed to generate presentation", request_id))
-
-        # Derive base URL from request (respects proxies if headers set)
-        base_url = str(request.base_url).rstrip('/')
-        def build_url(filename: Optional[str]):
-            if not filename:
-                return None
-            if SIGNED_DOWNLOADS and DOWNLOAD_SIGNING_KEY:
-                expires = int(time.time()) + 15 * 60  # 15 minutes
-                payload = {"rid": request_id, "file": filename, "exp": expires}
-                msg = f"{request_id}:{filename}:{expires}".encode()
-                sig = hmac.new(DOWNLOAD_SIGNING_KEY.encode(), msg, hashlib.sha256).hexdigest()
-                qs = urlencode({**payload, "sig": sig})
-                return f"{base_url}/download?{qs}"
-            else:
-                return f"{base_url}/static/{request_id}/{filename}"
-
-        return {
-            "request_id": request_id,
-            "summary": summary,
-            "pages": pdf_page_count,
-            "summary_pdf": build_url("summary.pdf"),
-            "graphical_abstract": build_url("graphical_abstract.png"),
-            "voiceover": build_url("voiceover.mp3"),
-            "presentation": build_url("presentation.pptx"),
-            "features": {"sdxl": ENABLE_SDXL, "tts": ENABLE_TTS, "signed_downloads": SIGNED_DOWNLOADS},
-            "speaker_notes": speaker_notes,
-            "warnings": warnings,
-        }
+            speaker_notes = summary  # provide plain text as a fallback
+            warnings.append("TTS_FAILED: Audio generation failed; provided speaker_notes instead")
+        else:
+            voiceover_path = audio_result
+
+        if isinstance(pptx_result, HTTPException):
+            logging.error(f"[{request_id}] PPTX error: {pptx_result.detail}")
+            raise HTTPException(status_code=pptx_result.status_code, detail=_error_response("PRESENTATION_FAILED", "Failed to generate presentation", request_id))
+        elif isinstance(pptx_result, BaseException):
+            raise pptx_result
+        presentation_path = pptx_result
+
+        result = _build_process_result(request, request_id, summary, pdf_page_count, speaker_notes, warnings)
+        # Only fully successful runs are cached, so transient SDXL/TTS failures are retried next time
+        if not warnings:
+            await asyncio.to_thread(_artifact_cache_store, artifact_key, request_dir, {
+                "summary": summary,
+                "pages": pdf_page_count,
+                "speaker_notes": speaker_notes,
+                "warnings": warnings,
+            })
+        inflight.set_result(result)
+        return result
     except Exception as e:
         logging.error(f"[{locals().get('request_id','-')}] Error processing paper: {str(e)}")
         # If it's already an HTTPException, pass through
-        if isinstance(e, HTTPException):
-            raise e
-        raise HTTPException(status_code=500, detail=_error_response("INTERNAL_ERROR", "Unexpected error", locals().get("request_id")))
+        if not isinstance(e, HTTPException):
+            e = HTTPException(status_code=500, detail=_error_response("INTERNAL_ERROR", "Unexpected error", locals().get("request_id")))
+        if inflight is not None and not inflight.done():
+            inflight.set_exception(e)
+            inflight.exception()  # mark retrieved when no follower is waiting
+        raise e
     finally:
         # Resource cleanup and monitoring
         try:
             request_id = locals().get('request_id', 'unknown')
+
+            # Release followers and drop the in-flight entry
+            if inflight is not None:
+                if not inflight.done():
+                    inflight.cancel()
+                if _INFLIGHT.get(inflight_key) is inflight:
+                    del _INFLIGHT[inflight_key]
             
             # Log memory usage for monitoring
             memory_usage = get_memory_usage()
@@ -0,0 +1,70 @@
+from main import _ELISION, _fit_text_to_budget
+
+
+def _paper(*parts):
+    return "\n".join(parts)
+
+
+def test_short_text_is_unchanged():
+    assert _fit_text_to_budget("Abstract\nshort paper", 1000) == "Abstract\nshort paper"
+
+
+def test_title_containing_references_substring_keeps_preamble_and_abstract():
+    text = _paper(
+        "Learning from Human Preferences",
+        "Jane Doe, John Roe",
+        "Abstract",
+        "a" * 300,
+        "1 Introduction",
+        "i" * 5000,
+        "References",
+        "x" * 5000,
+    )
+    out = _fit_text_to_budget(text, 2000)
+    assert "Learning from Human Preferences" in out
+    assert "a" * 300 in out
+    assert "x" not in out
+
+
+def test_section_mentioning_appendix_is_not_dropped():
+    text = _paper(
+        "Abstract",
+        "a" * 200,
+        "2 Results",
+        "As shown in Appendix B, " + "r" * 5000,
+        "Appendix B",
+        "z" * 5000,
+    )
+    out = _fit_text_to_budget(text, 2000)
+    assert "As shown in Appendix B" in out
+    assert "z" not in out
+
+
+def test_wrapped_body_line_is_not_a_header():
+    text = _paper(
+        "1 Introduction",
+        "i" * 100,
+        "references to earlier work show that",
+        "m" * 100,
+        "2 Methods",
+        "q" * 5000,
+        "5. Conclusion",
+        "c" * 300,
+    )
+    out = _fit_text_to_budget(text, 2000)
+    assert "references to earlier work show that\n" + "m" * 100 in out
+    assert "c" * 300 in out
+
+
+def test_output_never_exceeds_budget():
+    sections = [f"{n} Section{n}\n" + "s" * 3000 for n in range(1, 8)]
+    text = _paper("Abstract", "a" * 900, *sections, "Conclusions", "c" * 900)
+    for budget in (50, 500, 2000, 2021):
+        assert len(_fit_text_to_budget(text, budget)) <= budget
+    assert len(_fit_text_to_budget("z" * 10000, 1000)) <= 1000
+
+
+def test_headerless_text_keeps_head_and_tail():
+    text = "h" * 5000 + "t" * 5000
+    out = _fit_text_to_budget(text, 1000)
+    assert out.startswith("h") and out.endswith("t") and _ELISION in out